@@ -1,16 +1,22 @@
 import pandas as pd
 import aiohttp
 import asyncio
-import tempfile
 import os
-from io import StringIO
-import requests
+import sys
+import time
+import random
+import email.utils
 import yaml
-import aiofiles
 import logging
-from typing import List, Dict, Any, Optional
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Dict, Optional, NamedTuple, Tuple
 from dataclasses import dataclass
 import json
+from functools import lru_cache
+import re
+import csv
+from urllib.parse import urlsplit
 
 # -------------------------
 # 配置日志
@@ -21,6 +27,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def start_queue_logging() -> QueueListener:
+    # 日志先进入队列，由后台线程交给原有处理器写出，避免大量并发任务争用终端输出；
+    # 队列处理器和监听线程同时安装，不会出现日志只进队列却无人写出的情况
+    root = logging.getLogger()
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    root.handlers = [QueueHandler(log_queue)]
+    listener.start()
+    return listener
+
+# -------------------------
+# 可选加速依赖
+# -------------------------
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
+# 安装了 aiodns 时使用异步 DNS 解析，避免占用线程池；
+# Windows 默认的 Proactor 事件循环不支持 aiodns，因此不启用
+try:
+    import aiodns  # noqa: F401
+    HAS_AIODNS = sys.platform != "win32"
+except ImportError:
+    HAS_AIODNS = False
+
+# 安装了 orjson 时用它解析 JSON，大文件解析更快
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 # -------------------------
 # 数据类定义
 # -------------------------
@@ -31,6 +71,10 @@ class Config:
     download_if_miss: bool = False
     retry_times: int = 2
     keep_downloaded_file: bool = False
+    warm_with_range: bool = False
+    validate_content: bool = True
+    check_with_range: bool = False
+    rate_limit_per_host: float = 50
     download_dir: str = "downloads"
     output_csv: str = "output_cache_status.csv"
     auto_purge_cf_cache: bool = False
@@ -39,18 +83,43 @@ class Config:
     cf_zone_id: Optional[str] = None
     head_wait_seconds: int = 1
 
+class CheckResult(NamedTuple):
+    status: str
+    cf_cache_status: Optional[str] = None
+    age: Optional[str] = None
+    error: Optional[str] = None
+
+# 结果文件的列顺序
+RESULT_FIELDS = ["url", "column"] + list(CheckResult._fields)
+
+# 检测请求用会话级默认超时；下载文件和 JSON 目录允许更长时间
+CHECK_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5, sock_connect=5)
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=5, sock_connect=5)
+
+# -------------------------
+# URL 解析
+# -------------------------
+@lru_cache(maxsize=4096)
+def url_info(url: str) -> Tuple[str, str]:
+    # 返回 (主机名, 路径最后一段文件名)，不含查询参数和锚点；重试时同一 URL 不再重复解析
+    parts = urlsplit(url)
+    return parts.hostname or "", parts.path.rsplit("/", 1)[-1]
+
 # -------------------------
 # 配置管理
 # -------------------------
 class ConfigManager:
+    # PyYAML 编译了 libyaml 时使用 C 实现的安全加载器
+    YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    
     @staticmethod
     def load_config() -> Config:
         with open("config.yaml", "r", encoding="utf-8") as f:
-            config_data = yaml.safe_load(f)
+            config_data = yaml.load(f, Loader=ConfigManager.YAML_LOADER)
         
         if os.path.exists("config_local.yaml"):
             with open("config_local.yaml", "r", encoding="utf-8") as f:
-                local_config = yaml.safe_load(f)
+                local_config = yaml.load(f, Loader=ConfigManager.YAML_LOADER)
                 config_data.update(local_config)
         
         return Config(**config_data)
@@ -62,66 +131,127 @@ class JSONProcessor:
     def __init__(self, config: Config):
         self.config = config
     
-    def load_dataframe(self) -> pd.DataFrame:
+    @staticmethod
+    def is_http(val) -> bool:
+        # 只对前 4 个字符转小写，不必复制整条 URL
+        return isinstance(val, str) and val[:4].lower() == "http"
+    
+    async def load_dataframe(self, session: aiohttp.ClientSession) -> pd.DataFrame:
         url = self.config.url
+        loop = asyncio.get_running_loop()
         if url.startswith("http"):
-            r = requests.get(url)
-            r.raise_for_status()
-            data = r.json()
+            async with session.get(url, timeout=DOWNLOAD_TIMEOUT) as resp:
+                resp.raise_for_status()
+                raw = await resp.read()
         elif os.path.exists(url):
-            with open(url, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            raw = await loop.run_in_executor(None, self.read_file, url)
         else:
             raise ValueError(f"JSON 文件无效或不存在: {url}")
 
-        df = pd.DataFrame(data)
-
-        # 过滤空行或非 http 开头字段
-        def is_http(val):
-            return isinstance(val, str) and val.lower().startswith("http")
-        
-        df_filtered = df[df.apply(lambda row: any(is_http(v) for v in row), axis=1)]
-
-        return df_filtered
+        # 解析和构造 DataFrame 放到线程池，不阻塞事件循环
+        return await loop.run_in_executor(None, self.parse, raw)
+    
+    @staticmethod
+    def read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+    
+    @staticmethod
+    def parse(raw: bytes) -> pd.DataFrame:
+        # 直接解析原始字节，避免先解码成 str 再交给 json；
+        # 空行和非 http 字段在 extract_urls 中按列过滤，这里不再逐行 apply
+        return pd.DataFrame(json_loads(raw))
+    
+    def extract_urls(self, df: pd.DataFrame) -> Dict[str, List[str]]:
+        # 返回 url -> 所在列名列表，重复出现的 URL 只检测一次；
+        # 按列取出底层数组，避免 iterrows 为每一行构造 Series
+        targets: Dict[str, List[str]] = {}
+        for col in df.columns:
+            values = df[col].to_numpy(dtype=object)
+            # 先整列剔除空值，只对非空单元格做字符串判断
+            for val in values[pd.notna(values)]:
+                if self.is_http(val):
+                    targets.setdefault(val, []).append(col)
+        return targets
 
 # -------------------------
 # 内容验证器
 # -------------------------
 class ContentValidator:
+    # 预编译、忽略大小写的单次扫描，不必每次先 lower() 复制一份
+    ERROR_PATTERN = re.compile(rb'<html|\{"code"|failed', re.IGNORECASE)
+    
     @staticmethod
     def is_error_content(chunk: bytes) -> bool:
-        return b"<html" in chunk.lower() or b"{\"code\"" in chunk.lower() or b"failed" in chunk.lower()
+        return ContentValidator.ERROR_PATTERN.search(chunk) is not None
 
 # -------------------------
 # Cloudflare 缓存管理器
 # -------------------------
 class CloudflareCacheManager:
+    # Cloudflare 按 URL 清除缓存时，单次请求最多 30 个文件
+    PURGE_BATCH_SIZE = 30
+    # 同时进行的清除请求数，避免触发 CF API 速率限制
+    PURGE_CONCURRENCY = 4
+    # 边检测边清除时，收到第一个错误 URL 后最多再等多久凑成一批（秒）
+    PURGE_LINGER_SECONDS = 1.0
+    
     def __init__(self, config: Config):
         self.config = config
-        self.session = None
     
-    async def __aenter__(self):
-        if self.config.auto_purge_cf_cache:
-            self.session = aiohttp.ClientSession()
-        return self
+    def is_configured(self) -> bool:
+        return all([self.config.cf_api_url, self.config.cf_api_token, self.config.cf_zone_id])
     
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+    async def drain(self, session: aiohttp.ClientSession, purge_queue: asyncio.Queue):
+        # 持续从队列取错误 URL，凑满一批或等待超时后立即清除；收到 None 表示检测结束
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            url = await purge_queue.get()
+            if url is None:
+                break
+            batch = [url]
+            deadline = loop.time() + self.PURGE_LINGER_SECONDS
+            while len(batch) < self.PURGE_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    url = await asyncio.wait_for(purge_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if url is None:
+                    finished = True
+                    break
+                batch.append(url)
+            await self.purge_cache(session, batch)
     
-    async def purge_cache(self, urls: List[str]):
-        if not all([self.config.cf_api_url, self.config.cf_api_token, self.config.cf_zone_id]):
+    async def purge_cache(self, session: aiohttp.ClientSession, urls: List[str]):
+        if not self.is_configured():
             logger.warning("CF API 配置不完整，无法清除缓存")
             return False
         
+        headers = {
+            "Authorization": f"Bearer {self.config.cf_api_token}", 
+            "Content-Type": "application/json"
+        }
+        sem = asyncio.Semaphore(self.PURGE_CONCURRENCY)
+        size = self.PURGE_BATCH_SIZE
+        results = await asyncio.gather(*[
+            self._purge_batch(sem, session, urls[i:i + size], headers)
+            for i in range(0, len(urls), size)
+        ])
+        succeeded = sum(results)
+        if len(results) > 1:
+            logger.info(f"批量清除完成：{succeeded}/{len(results)} 批成功")
+        return succeeded == len(results)
+    
+    async def _purge_batch(self, sem: asyncio.Semaphore, session: aiohttp.ClientSession,
+                           urls: List[str], headers: Dict[str, str]) -> bool:
         try:
-            headers = {
-                "Authorization": f"Bearer {self.config.cf_api_token}", 
-                "Content-Type": "application/json"
-            }
             payload = {"files": urls}
             
-            async with self.session.post(
+            async with sem, session.post(
                 f"{self.config.cf_api_url}/zones/{self.config.cf_zone_id}/purge_cache", 
                 json=payload, 
                 headers=headers
@@ -137,44 +267,130 @@ class CloudflareCacheManager:
             logger.error(f"清除缓存时发生错误: {e}")
             return False
 
+# -------------------------
+# 速率限制器
+# -------------------------
+class TokenBucket:
+    # 令牌桶：每秒补充 rate 个令牌，最多积攒 capacity 个，用于平滑对同一主机的突发请求；
+    # rate 小于 1 时容量至少为 1，否则永远攒不够一个令牌
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class RateLimitedError(Exception):
+    def __init__(self, retry_after: Optional[str]):
+        super().__init__(f"HTTP 429 请求被限流 (Retry-After: {retry_after})")
+        self.retry_after = self.parse_retry_after(retry_after)
+    
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        # Retry-After 可以是秒数，也可以是 HTTP 日期
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, when.timestamp() - time.time())
+
 # -------------------------
 # URL 检查器
 # -------------------------
 class URLChecker:
+    # 开启 check_with_range 时只请求前 64 字节：响应头里已有缓存状态，正文仅用于判断是否为错误内容
+    SNIFF_HEADERS = {"Range": "bytes=0-63"}
+    # 这些媒体类型说明返回的是错误页或接口错误，而不是资源本身
+    ERROR_CONTENT_TYPES = frozenset({"text/html", "application/xhtml+xml", "application/json"})
+    # 重试退避：0.25s 起指数增长，最多 8s，另加随机抖动；Retry-After 最多等待 60s
+    RETRY_BASE_DELAY = 0.25
+    RETRY_MAX_DELAY = 8.0
+    RETRY_AFTER_MAX = 60.0
+    
     def __init__(self, config: Config):
         self.config = config
         self.validator = ContentValidator()
+        self.limiters: Dict[str, TokenBucket] = {}
     
-    async def check_url(self, session: aiohttp.ClientSession, url: str, col: str) -> Dict[str, Any]:
-        result = {"url": url, "column": col, "status": None, "cf_cache_status": None, "age": None, "error": None}
-        
+    async def wait_for_slot(self, url: str):
+        # 按主机限速，rate_limit_per_host 为 0 时不限速
+        if self.config.rate_limit_per_host <= 0:
+            return
+        host, _ = url_info(url)
+        limiter = self.limiters.get(host)
+        if limiter is None:
+            limiter = self.limiters[host] = TokenBucket(self.config.rate_limit_per_host)
+        await limiter.acquire()
+    
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        # 被限流时优先遵循 Retry-After，否则带抖动的指数退避，避免所有任务同时重试
+        if isinstance(error, RateLimitedError) and error.retry_after is not None:
+            return min(error.retry_after, self.RETRY_AFTER_MAX)
+        delay = min(self.RETRY_MAX_DELAY, self.RETRY_BASE_DELAY * 2 ** attempt)
+        return delay + random.uniform(0, self.RETRY_BASE_DELAY)
+    
+    async def check_url(self, session: aiohttp.ClientSession, url: str, col: str) -> CheckResult:
         for attempt in range(self.config.retry_times + 1):
             try:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+                await self.wait_for_slot(url)
+                # 不校验内容时只需要响应头，用 HEAD 即可
+                if self.config.validate_content:
+                    headers = self.SNIFF_HEADERS if self.config.check_with_range else None
+                    request = session.get(url, headers=headers)
+                else:
+                    request = session.head(url, allow_redirects=True)
+                async with request as resp:
+                    if resp.status == 429:
+                        raise RateLimitedError(resp.headers.get("retry-after"))
+                    
                     cf_status = resp.headers.get("cf-cache-status", "N/A").upper()
                     age = resp.headers.get("age", "0")
-                    content_type = resp.headers.get("content-type", "")
+                    media_type = resp.headers.get("content-type", "").split(";", 1)[0].strip().lower()
                     
                     # HTML/JSON/错误返回视为失败
-                    if "text/html" in content_type.lower() or "application/json" in content_type.lower():
+                    if media_type in self.ERROR_CONTENT_TYPES:
                         raise ValueError("返回 HTML/JSON")
                     
-                    chunk = await resp.content.read(64)
-                    if self.validator.is_error_content(chunk):
-                        raise ValueError("前几个字节判定为错误内容")
+                    # 416 表示对空文件发起了 Range 请求，没有可校验的内容
+                    if self.config.validate_content and resp.status != 416:
+                        # 循环读满 64 字节或读到结尾，避免 read(64) 只拿到第一个网络分片；
+                        # 不按 Content-Length 定长读取，压缩传输时它是压缩后的长度，与解压后的内容对不上
+                        chunk = b""
+                        while len(chunk) < 64:
+                            part = await resp.content.read(64 - len(chunk))
+                            if not part:
+                                break
+                            chunk += part
+                        if self.validator.is_error_content(chunk):
+                            raise ValueError("前几个字节判定为错误内容")
                     
-                    result.update({"status": "SUCCESS", "cf_cache_status": cf_status, "age": age})
                     logger.info(f"[SUCCESS] col: {col} | {cf_status} | age: {age} | url: {url}")
-                    return result
+                    return CheckResult("SUCCESS", cf_status, age)
                     
             except Exception as e:
                 if attempt < self.config.retry_times:
                     logger.warning(f"[WARN] col: {col} | url: {url} | 尝试 {attempt + 1}/{self.config.retry_times} | 错误: {e}")
-                    await asyncio.sleep(0.5)
+                    await asyncio.sleep(self.retry_delay(e, attempt))
                 else:
-                    result.update({"status": "ERROR", "error": str(e)})
                     logger.error(f"[ERROR] col: {col} | url: {url} | 尝试 {attempt + 1}/{self.config.retry_times} | 错误: {e}")
-                    return result
+                    return CheckResult("ERROR", error=str(e))
 
 # -------------------------
 # 文件下载器
@@ -183,12 +399,50 @@ class FileDownloader:
     def __init__(self, config: Config):
         self.config = config
     
+    def local_path(self, url: str) -> str:
+        _, name = url_info(url)
+        name = name or "index"
+        return os.path.join(self.config.download_dir, name)
+    
     async def download_file(self, session: aiohttp.ClientSession, url: str, filename: str):
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        async with session.get(url, timeout=aiohttp.ClientTimeout(total=60)) as resp:
-            async with aiofiles.open(filename, "wb") as f:
-                async for chunk in resp.content.iter_chunked(1024 * 1024):
-                    await f.write(chunk)
+        # 打开、写入、关闭和删除文件都可能很慢（网络盘等），全部放到线程池执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        async with session.get(url, timeout=DOWNLOAD_TIMEOUT) as resp:
+            resp.raise_for_status()
+            f = await loop.run_in_executor(None, open, filename, "wb")
+            # 文件由本次调用创建后才负责清理，请求阶段失败不会删掉之前已保存的同名文件
+            try:
+                try:
+                    # 每块 1 MiB 才切换一次线程，开销可以忽略
+                    async for chunk in resp.content.iter_chunked(1024 * 1024):
+                        await loop.run_in_executor(None, f.write, chunk)
+                finally:
+                    await loop.run_in_executor(None, f.close)
+            except BaseException:
+                # 写入中途失败或被取消（Ctrl-C、dispatch 结束工作协程）时都删除不完整的文件
+                await loop.run_in_executor(None, self.remove_file, filename)
+                raise
+    
+    @staticmethod
+    def remove_file(filename: str):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    async def save_url(self, session: aiohttp.ClientSession, url: str):
+        await self.download_file(session, url, self.local_path(url))
+
+    async def warm_url(self, session: aiohttp.ClientSession, url: str):
+        # 只为触发边缘缓存，读取后直接丢弃，不落盘
+        headers = {"Range": "bytes=0-0"} if self.config.warm_with_range else None
+        async with session.get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT) as resp:
+            if resp.status == 206:
+                await resp.read()
+                return
+            # 未开启 Range 或源站不支持 Range（返回 200）时完整读取
+            async for _ in resp.content.iter_chunked(1024 * 1024):
+                pass
 
 # -------------------------
 # 主控制器
@@ -200,55 +454,114 @@ class CacheCheckController:
         self.url_checker = URLChecker(config)
         self.downloader = FileDownloader(config)
         self.cf_manager = CloudflareCacheManager(config)
-        self.results = []
+        # 检测结果逐行写入 CSV，内存中只保留出错的 URL
+        self.writer = None
+        self.error_urls: List[str] = []
+        # 开启自动清除时，错误 URL 通过该队列交给后台清除任务
+        self.purge_queue: Optional[asyncio.Queue] = None
+        # 检测失败后的处理方式只取决于配置，在这里选定一次
+        if not config.download_if_miss:
+            self.handle_error = None
+        elif config.keep_downloaded_file:
+            self.handle_error = self.downloader.save_url
+            # 下载目录只在启动时创建一次
+            os.makedirs(config.download_dir, exist_ok=True)
+        else:
+            self.handle_error = self.downloader.warm_url
     
-    async def worker(self, sem: asyncio.Semaphore, session: aiohttp.ClientSession, url: str, col: str):
-        async with sem:
-            result = await self.url_checker.check_url(session, url, col)
-            self.results.append(result)
-            
-            # 如果检测失败且配置了下载功能
-            if result["status"] == "ERROR" and self.config.download_if_miss:
-                try:
-                    if self.config.keep_downloaded_file:
-                        filename = os.path.join(self.config.download_dir, os.path.basename(url))
-                    else:
-                        tmp_file = tempfile.NamedTemporaryFile(delete=False)
-                        filename = tmp_file.name
-                        tmp_file.close()
-                    
-                    await self.downloader.download_file(session, url, filename)
-                    await asyncio.sleep(self.config.head_wait_seconds)
-                    if not self.config.keep_downloaded_file:
-                        os.remove(filename)
-                except Exception as e:
-                    logger.error(f"下载文件时出错 {url}: {e}")
+    async def worker(self, session: aiohttp.ClientSession, url: str, cols: List[str]):
+        result = await self.url_checker.check_url(session, url, cols[0])
+        # 同一 URL 只请求一次，结果写到它出现过的每个位置
+        self.writer.writerows((url, col) + result for col in cols)
+        if result.status != "ERROR":
+            return
+        
+        # 出错的 URL 在检测完成时就记下并交给清除任务，无需最后再扫描结果
+        self.error_urls.append(url)
+        if self.purge_queue is not None:
+            self.purge_queue.put_nowait(url)
+        # 如果配置了下载功能
+        if self.handle_error is not None:
+            try:
+                await self.handle_error(session, url)
+                await asyncio.sleep(self.config.head_wait_seconds)
+            except Exception as e:
+                logger.error(f"下载文件时出错 {url}: {e}")
+    
+    async def consume(self, task_queue: asyncio.Queue, session: aiohttp.ClientSession):
+        while True:
+            item = await task_queue.get()
+            if item is None:
+                break
+            url, cols = item
+            try:
+                await self.worker(session, url, cols)
+            except Exception as e:
+                # 不能让单个 URL 的意外错误结束工作协程，否则生产者会阻塞在已满的队列上
+                logger.error(f"处理 URL 时发生意外错误 {url}: {e}")
+    
+    async def dispatch(self, session: aiohttp.ClientSession, targets: Dict[str, List[str]]):
+        # 固定数量的工作协程从有界队列取任务，不再为每个 URL 预先创建协程
+        task_queue = asyncio.Queue(maxsize=self.config.max_concurrent * 4)
+        consumers = [
+            asyncio.create_task(self.consume(task_queue, session))
+            for _ in range(self.config.max_concurrent)
+        ]
+        try:
+            for target in targets.items():
+                await task_queue.put(target)
+            for _ in consumers:
+                await task_queue.put(None)
+            await asyncio.gather(*consumers)
+        finally:
+            # 被取消或出错时一并结束工作协程并等待其退出，再关闭会话和结果文件；正常结束时这里不会有影响
+            for consumer in consumers:
+                consumer.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
     
     async def run(self):
-        df = self.json_processor.load_dataframe()
-        
-        sem = asyncio.Semaphore(self.config.max_concurrent)
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for _, row in df.iterrows():
-                for col, val in row.items():
-                    if isinstance(val, str) and val.lower().startswith("http"):
-                        tasks.append(self.worker(sem, session, val, col))
-            await asyncio.gather(*tasks)
-        
-        # 保存结果到 CSV
-        results_df = pd.DataFrame(self.results)
-        results_df.to_csv(self.config.output_csv, index=False)
-        logger.info(f"结果已保存到 {self.config.output_csv}")
-        
-        # 清除 CF 缓存
-        error_urls = [r["url"] for r in self.results if r["status"] == "ERROR"]
-        if self.config.auto_purge_cf_cache and error_urls:
-            logger.info(f"检测到 {len(error_urls)} 个错误 URL，开始批量清除 CF 缓存...")
-            async with self.cf_manager as cf_manager:
-                await cf_manager.purge_cache(error_urls)
-        elif error_urls:
-            logger.info(f"检测到 {len(error_urls)} 个错误 URL")
+        # 由连接池限制并发连接数，同时缓存 DNS 解析结果；
+        # 空闲连接保持更久，让后续请求复用已建立的 TLS 连接
+        # 总连接数留出余量给 CF API 等其他主机，单个 CDN 主机仍受 max_concurrent 限制
+        connector = aiohttp.TCPConnector(
+            limit=self.config.max_concurrent * 2,
+            limit_per_host=self.config.max_concurrent,
+            ttl_dns_cache=3600,
+            keepalive_timeout=60,
+            resolver=aiohttp.AsyncResolver() if HAS_AIODNS else None
+        )
+        async with aiohttp.ClientSession(connector=connector, timeout=CHECK_TIMEOUT) as session:
+            df = await self.json_processor.load_dataframe(session)
+            targets = await asyncio.get_running_loop().run_in_executor(
+                None, self.json_processor.extract_urls, df
+            )
+            
+            # 清除 CF 缓存（复用同一个会话）：后台任务与剩余检测并行，按批提交
+            purge_task = None
+            if self.config.auto_purge_cf_cache:
+                if self.cf_manager.is_configured():
+                    self.purge_queue = asyncio.Queue()
+                    purge_task = asyncio.create_task(self.cf_manager.drain(session, self.purge_queue))
+                else:
+                    logger.warning("CF API 配置不完整，无法清除缓存")
+            
+            try:
+                # 边检测边把结果写入 CSV，中途中断时已完成的部分也会保留
+                with open(self.config.output_csv, "w", newline="", encoding="utf-8") as f:
+                    self.writer = csv.writer(f)
+                    self.writer.writerow(RESULT_FIELDS)
+                    await self.dispatch(session, targets)
+                logger.info(f"结果已保存到 {self.config.output_csv}")
+                
+                if self.error_urls:
+                    logger.info(f"检测到 {len(self.error_urls)} 个错误 URL")
+                if purge_task is not None:
+                    self.purge_queue.put_nowait(None)
+                    await purge_task
+            finally:
+                if purge_task is not None:
+                    purge_task.cancel()
+                    await asyncio.gather(purge_task, return_exceptions=True)
         
         logger.info("检测完成。")
 
@@ -265,4 +578,14 @@ async def main():
         raise
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    log_listener = start_queue_logging()
+    try:
+        # 只在作为脚本运行时启用 uvloop，被 import 时不改动全局事件循环设置
+        if HAS_UVLOOP and sys.version_info >= (3, 12):
+            asyncio.run(main(), loop_factory=uvloop.new_event_loop)
+        else:
+            if HAS_UVLOOP:
+                uvloop.install()
+            asyncio.run(main())
+    finally:
+        log_listener.stop()